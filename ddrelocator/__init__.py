@@ -7,4 +7,10 @@ the master-event algorithm.
 """
 
 from ddrelocator.headers import Event, Obs, Solution, Station
-from ddrelocator.locator import find_solution, try_solution
+from ddrelocator.locator import (
+    find_best_solution,
+    find_solution,
+    find_solution_adaptive,
+    refine_solution,
+    try_solution,
+)
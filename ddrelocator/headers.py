@@ -2,13 +2,14 @@
 Classes for ddrelocator.
 """
 
-from dataclasses import dataclass
+import math
+from dataclasses import dataclass, field
 
 import numpy as np
 from obspy import UTCDateTime
 
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     """
     Class for event information.
@@ -37,9 +38,13 @@ class Event:
     longitude: float
     depth: float
     magnitude: float  # unused
+    id: str = field(init=False, repr=False)
 
     def __post_init__(self):
-        self.origin = UTCDateTime(self.origin)
+        # Skip the string parser when the origin is already a UTCDateTime, e.g.,
+        # when constructed from another event in Solution.to_event().
+        if not isinstance(self.origin, UTCDateTime):
+            self.origin = UTCDateTime(self.origin)
         self.id = self.origin.strftime("%Y%m%d%H%M%S")
 
     def __str__(self):
@@ -48,7 +53,7 @@ class Event:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Station:
     """
     Class for station information.
@@ -71,7 +76,7 @@ class Station:
     elevation: float = 0.0  # unused
 
 
-@dataclass
+@dataclass(slots=True)
 class Obs:
     """
     Class for observations.
@@ -123,6 +128,9 @@ class Obs:
     dt: float
     cc: float = 0.0
     weight: float = 1.0
+    # Solution-dependent attributes, set by try_solution(..., keep_residual=True)
+    dt_pre: float = field(init=False, default=np.nan, repr=False)
+    residual: float = field(init=False, default=np.nan, repr=False)
 
 
 class Solution:
@@ -130,6 +138,8 @@ class Solution:
     Class for solution.
     """
 
+    __slots__ = ("type", "dlat", "dlon", "ddepth", "ddist", "az", "tmean", "misfit")
+
     def __init__(self, params, type):
         """
         Parameters
@@ -200,11 +210,14 @@ class Solution:
             case "cylindrical":
                 earth_radius = 6371.0  # km
                 ddist = self.ddist / 1000.0  # convert distance from meter to km
-                azimuth = np.radians(self.az)  # convert azimuth from degree to radian
-                latitude, longitude = np.radians([master.latitude, master.longitude])
-                latitude += ddist / earth_radius * np.cos(azimuth)
-                longitude += ddist / earth_radius * np.sin(azimuth) / np.cos(latitude)
-                latitude, longitude = np.degrees([latitude, longitude])
+                azimuth = math.radians(self.az)  # convert azimuth from degree to radian
+                latitude = math.radians(master.latitude)
+                longitude = math.radians(master.longitude)
+                latitude += ddist / earth_radius * math.cos(azimuth)
+                longitude += (
+                    ddist / earth_radius * math.sin(azimuth) / math.cos(latitude)
+                )
+                latitude, longitude = math.degrees(latitude), math.degrees(longitude)
                 depth = master.depth + self.ddepth / 1000.0
 
         return Event(
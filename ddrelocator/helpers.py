@@ -3,6 +3,8 @@ Helper functions for ddrelocator.
 """
 
 import pickle
+from dataclasses import fields
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
@@ -40,6 +42,38 @@ def distaz(lat1, lon1, lat2, lon2):
     return dist, az
 
 
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Calculate the great-circle distance (in degree) between two geographic points.
+
+    Unlike distaz(), this function assumes a spherical Earth, but it works with NumPy
+    arrays so the distances of many point pairs can be calculated at once. It's much
+    faster than calling distaz() in a loop, and is accurate enough for the grid search.
+
+    Parameters
+    ----------
+    lat1 : float or array
+        Latitude of point 1 in degree.
+    lon1 : float or array
+        Longitude of point 1 in degree.
+    lat2 : float or array
+        Latitude of point 2 in degree.
+    lon2 : float or array
+        Longitude of point 2 in degree.
+
+    Returns
+    -------
+    dist : float or array
+        Distance between two points in degree.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2.0
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2.0
+    )
+    return np.degrees(2.0 * np.arcsin(np.sqrt(a)))
+
+
 def get_ttime_slowness(model, depth, distance, phase_list):
     """
     Get travel time, horizontal slowness, and vertical slowness for a given phase.
@@ -86,6 +120,20 @@ def get_ttime_slowness(model, depth, distance, phase_list):
     of 60 degrees, the P travel time for sources at 50 and 51 km are 601.3345 and
     601.2268 s, respectively. So, travel time decreases when source depth increases.
     """
+    # Workflows often request the same (depth, distance, phase) combination many
+    # times, e.g., for different events recorded at the same station. Delegate to a
+    # memoized helper so repeated TauP calls (~ms each) become cache hits.
+    return _get_ttime_slowness_cached(model, depth, distance, tuple(phase_list))
+
+
+@lru_cache(maxsize=100_000)
+def _get_ttime_slowness_cached(model, depth, distance, phase_list):
+    """
+    Memoized backend of get_ttime_slowness().
+
+    Arguments must be hashable, so phase_list is a tuple here. The model is hashed by
+    identity, which is fine since TauPyModel instances are created once and reused.
+    """
     radius = 6371.0
     arrivals = model.get_travel_times(
         source_depth_in_km=depth,
@@ -127,7 +175,10 @@ def obslist_to_dataframe(obslist):
     df : pandas.DataFrame
         DataFrame of observations.
     """
-    return pd.DataFrame([vars(obs) for obs in obslist])
+    # Build the DataFrame column by column, avoiding one dict copy per observation.
+    return pd.DataFrame(
+        {f.name: [getattr(obs, f.name) for obs in obslist] for f in fields(Obs)}
+    )
 
 
 def dump_obslist(obslist, filename):
@@ -141,8 +192,9 @@ def dump_obslist(obslist, filename):
     filename : str
         Output filename.
     """
-    # Convert to pandas.DataFrame and save to CSV
-    df = obslist_to_dataframe(obslist)
+    # Convert to pandas.DataFrame and save to CSV. The solution-dependent columns
+    # are dropped so that the file can be read back by read_obslist().
+    df = obslist_to_dataframe(obslist).drop(columns=["dt_pre", "residual"])
     df.to_csv(filename, sep=" ", index=False, float_format="%.6f")
 
 
@@ -160,24 +212,38 @@ def read_obslist(filename):
     obslist : list
         List of Obs objects.
     """
-    df = pd.read_csv(filename, sep=r"\s+", comment="#")
-    return [Obs(*(df.values.tolist()[i])) for i in range(len(df.index))]
+    # An explicit dtype schema skips the per-column type inference. The regex
+    # separator is kept so that hand-aligned files still parse.
+    dtype = dict.fromkeys(
+        ["latitude", "longitude", "distance", "azimuth", "time"], "float64"
+    )
+    dtype |= dict.fromkeys(["dtdd", "dtdh", "dt", "cc", "weight"], "float64")
+    df = pd.read_csv(filename, sep=r"\s+", comment="#", dtype=dtype)
+    return [Obs(*row) for row in df.itertuples(index=False)]
 
 
 def dump_solutions(grid, Jout, filename):
     """
-    Dump list of solutions into a file.
+    Dump the grid and misfit values of a grid search into a compressed npz file.
+
+    The arrays serialize at disk bandwidth and are readable from any NumPy version,
+    unlike the pickle format used previously.
     """
-    with open(filename, "wb") as f:
-        pickle.dump((grid, Jout), f)
+    np.savez_compressed(filename, grid=grid, Jout=Jout)
 
 
 def load_solutions(filename):
     """
-    Read list of solutions from a file.
+    Read the grid and misfit values of a grid search from a file.
+
+    Reads the npz format written by dump_solutions(), with a pickle fallback for
+    legacy '.pkl' files.
     """
-    with open(filename, "rb") as f:
-        return pickle.load(f)
+    if str(filename).endswith(".pkl"):
+        with open(filename, "rb") as f:
+            return pickle.load(f)
+    with np.load(filename) as npz:
+        return npz["grid"], npz["Jout"]
 
 
 def read_events_from_csv(filename):
@@ -206,6 +272,7 @@ def read_events_from_csv(filename):
         List of events.
     """
     df = pd.read_csv(filename, comment="#")
+    # itertuples() is much faster than iterrows(), which builds a Series per row.
     return [
         Event(
             origin=ev.time,
@@ -214,5 +281,5 @@ def read_events_from_csv(filename):
             depth=ev.depth,
             magnitude=ev.magnitude,
         )
-        for _, ev in df.iterrows()
+        for ev in df.itertuples(index=False)
     ]
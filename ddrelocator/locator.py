@@ -2,13 +2,126 @@
 Main functions for relocation.
 """
 
+import os
+from multiprocessing import Pool
+
 import numpy as np
 from ddrelocator.headers import Solution
-from ddrelocator.helpers import distaz
 from obspy.geodetics import kilometers2degrees
 from scipy import optimize
 
 
+def pack_obs(obslist):
+    """
+    Pack the per-observation attributes into NumPy arrays.
+
+    The grid search reads the same observation attributes at every grid point. Packing
+    them into arrays once avoids the per-object attribute lookups in the hot loop and
+    lets try_solution() work on whole arrays instead of looping over Obs objects.
+
+    Parameters
+    ----------
+    obslist : list
+        List of Obs objects.
+
+    Returns
+    -------
+    obs : dict
+        Dictionary of NumPy arrays with keys ``latitude``, ``longitude``,
+        ``distance``, ``azimuth``, ``dtdd``, ``dtdh``, ``dt``, and ``weight``, plus
+        the precomputed station trigonometry ``lat_rad``, ``lon_rad``, and
+        ``cos_lat`` used by the distance kernel.
+    """
+    keys = [
+        "latitude",
+        "longitude",
+        "distance",
+        "azimuth",
+        "dtdd",
+        "dtdh",
+        "dt",
+        "weight",
+    ]
+    obs = {
+        key: np.array([getattr(obs, key) for obs in obslist], dtype=np.float64)
+        for key in keys
+    }
+    # Station trigonometric terms are constant across grid points, so hoist them out
+    # of the distance kernel.
+    obs["lat_rad"] = np.radians(obs["latitude"])
+    obs["lon_rad"] = np.radians(obs["longitude"])
+    obs["cos_lat"] = np.cos(obs["lat_rad"])
+    return obs
+
+
+def sphere_distance(latitude, longitude, obs):
+    """
+    Great-circle distance (in degree) from the given point(s) to the packed stations.
+
+    Same haversine formula as helpers.haversine(), but reuses the station
+    trigonometry precomputed by pack_obs() so that only the source-side terms are
+    evaluated per call.
+
+    Parameters
+    ----------
+    latitude : float or array
+        Source latitude in degree.
+    longitude : float or array
+        Source longitude in degree.
+    obs : dict
+        Dictionary of packed observation arrays from pack_obs().
+
+    Returns
+    -------
+    dist : array
+        Distance to each station in degree.
+    """
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    a = (
+        np.sin((obs["lat_rad"] - lat) / 2.0) ** 2.0
+        + np.cos(lat) * obs["cos_lat"] * np.sin((obs["lon_rad"] - lon) / 2.0) ** 2.0
+    )
+    return np.degrees(2.0 * np.arcsin(np.sqrt(a)))
+
+
+def predict_dt(master, obs, p1, p2, p3, *, sol_type):
+    """
+    Predicted traveltime differences for the given solution parameters.
+
+    The parameters can be scalars (a single solution) or broadcastable arrays (many
+    solutions at once), as long as the observation axis is the last one.
+
+    Parameters
+    ----------
+    master : Event
+        Master event.
+    obs : dict
+        Dictionary of packed observation arrays from pack_obs().
+    p1, p2, p3 : float or array
+        Solution parameters, i.e., (dlat, dlon, ddepth) for ``sol_type='geographic'``
+        or (ddist, az, ddepth) for ``sol_type='cylindrical'``.
+    sol_type : str
+        Solution type, either 'geographic' or 'cylindrical'.
+
+    Returns
+    -------
+    dt_pre : array
+        Predicted traveltime differences.
+    """
+    if sol_type == "geographic":
+        # Distance differences and traveltime differences for all observations at once.
+        # The reference distance is also calculated on the sphere so that the
+        # spherical-vs-ellipsoidal discrepancy cancels out in the difference.
+        dist0 = sphere_distance(master.latitude, master.longitude, obs)
+        distance = sphere_distance(master.latitude + p1, master.longitude + p2, obs)
+        return obs["dtdd"] * (distance - dist0) + obs["dtdh"] * p3
+    # cylindrical: ddist and ddepth are in meters
+    ddist = p1 / 1000.0  # convert to km
+    ddepth = p3 / 1000.0  # convert to km
+    ddist_deg = kilometers2degrees(-ddist * np.cos(np.radians(p2 - obs["azimuth"])))
+    return obs["dtdd"] * ddist_deg + obs["dtdh"] * ddepth
+
+
 def try_solution(master, obslist, sol, keep_residual=False):
     """
     Calculate the RMS of traveltime residuals for a given solution.
@@ -17,77 +130,94 @@ def try_solution(master, obslist, sol, keep_residual=False):
     ----------
     master : Event
         Master event.
-    obslist : list
-        List of Obs objects.
+    obslist : list or dict
+        List of Obs objects, or a dictionary of packed arrays from pack_obs().
     sol : Solution
         The solution to be tested.
     keep_residual : bool, optional
-        If True, keep the dt_pre and residual in the Obs object.
-    """
-    if sol.type == "geographic":
-        # Convert the solution to absolute location
-        latitude = master.latitude + sol.dlat
-        longitude = master.longitude + sol.dlon
-        # For all observations, calculate distance difference and traveltime difference
-        for obs in obslist:
-            distance = distaz(latitude, longitude, obs.latitude, obs.longitude)[0]
-            obs.dt_pre = obs.dtdd * (distance - obs.distance) + obs.dtdh * sol.ddepth
-    elif sol.type == "cylindrical":
-        ddist = sol.ddist / 1000.0  # convert to km
-        ddepth = sol.ddepth / 1000.0  # convert to km
-        for obs in obslist:
-            obs.dt_pre = (
-                obs.dtdd
-                * kilometers2degrees(-ddist * np.cos(np.radians(sol.az - obs.azimuth)))
-                + obs.dtdh * ddepth
-            )
+        If True, keep the dt_pre and residual in the Obs object. Only works when
+        obslist is a list of Obs objects.
+    """
+    obs = obslist if isinstance(obslist, dict) else pack_obs(obslist)
+
+    match sol.type:
+        case "geographic":
+            params = (sol.dlat, sol.dlon, sol.ddepth)
+        case "cylindrical":
+            params = (sol.ddist, sol.az, sol.ddepth)
+    dt_pre = predict_dt(master, obs, *params, sol_type=sol.type)
 
     # Calculate the residuals
-    for obs in obslist:
-        obs.residual = obs.dt - obs.dt_pre
+    residual = obs["dt"] - dt_pre
 
-    # Calculate the RMS of residuals
-    residuals = np.array([obs.residual for obs in obslist])
-    weights = np.array([obs.weight for obs in obslist])
     # tmean is the weighted average of residuals, as the origin time correction
-    sol.tmean = np.average(residuals, weights=weights)
-    sol.misfit = np.sqrt(np.average((residuals - sol.tmean) ** 2.0, weights=weights))
+    sol.tmean = np.average(residual, weights=obs["weight"])
+    residual -= sol.tmean
+    # misfit is the weighted RMS of the demeaned residuals
+    sol.misfit = np.sqrt(np.average(residual**2.0, weights=obs["weight"]))
 
-    # keep dt_pre and residual in the obs object or not
-    if keep_residual:
-        for obs in obslist:
-            obs.residual -= sol.tmean
-    else:
-        for obs in obslist:
-            del obs.residual, obs.dt_pre
+    # keep dt_pre and residual in the obs objects or not
+    if keep_residual and not isinstance(obslist, dict):
+        for obs_, dt_pre_, residual_ in zip(obslist, dt_pre, residual):
+            obs_.dt_pre = dt_pre_
+            obs_.residual = residual_
 
 
-def try_solution_wrapper(params, *args):
+def grid_misfit(master, obs, grid, sol_type):
     """
-    Wrapper for try_solution() to be used in grid search.
+    Misfit values for a (possibly partial) grid of solution parameters.
 
     Parameters
     ----------
-    params : tuple
-        Parameters for brute force search. It's also the parameters for the solution to
-        be tested.
-    args : tuple
-        Tuple of (master, obslist, sol_type).
+    master : Event
+        Master event.
+    obs : dict
+        Dictionary of packed observation arrays from pack_obs().
+    grid : array
+        Grid of solution parameters with shape (3, n1, n2, n3).
+    sol_type : str
+        Solution type, either 'geographic' or 'cylindrical'.
 
     Returns
     -------
-    misfit : float
-        RMS of traveltime residuals.
+    Jout : array
+        Misfit values on the grid with shape (n1, n2, n3), in single precision.
+
+    Notes
+    -----
+    The predicted traveltime differences are computed in double precision, because
+    the trial-minus-reference distance difference is a tiny number obtained from two
+    large ones and would lose several digits in single precision. The residuals are
+    then reduced in single precision, which halves the memory traffic of the largest
+    arrays and is far more precision than the ~1 ms traveltime differences carry.
     """
-    master, obslist, sol_type = args
-    sol = Solution(params, sol_type)
-    try_solution(master, obslist, sol)
-    return sol.misfit
+    # Use open (broadcastable) parameter axes, with the observation axis appended.
+    # The distance term only depends on the first two parameters, so it broadcasts
+    # at shape (n1, n2, 1, nobs) and the expensive trigonometry is evaluated n3
+    # times less often; the depth term expands the array to full size in the final
+    # cheap multiply-add.
+    p1 = grid[0][:, :1, :1, np.newaxis]
+    p2 = grid[1][:1, :, :1, np.newaxis]
+    p3 = grid[2][:1, :1, :, np.newaxis]
+    dt_pre = predict_dt(master, obs, p1, p2, p3, sol_type=sol_type)
+    # Overwrite the dt_pre buffer instead of allocating another full-grid array.
+    residual = np.subtract(obs["dt"], dt_pre, out=dt_pre)
+    residual = residual.astype(np.float32)
+    weight = obs["weight"].astype(np.float32)
+    wsum = weight.sum()
+    tmean = residual @ weight / wsum
+    residual -= tmean[..., np.newaxis]
+    # The einsum contracts the squared residuals against the weights in one pass,
+    # without materializing another array of the full grid size.
+    return np.sqrt(np.einsum("...i,...i,i->...", residual, residual, weight) / wsum)
 
 
-def find_solution(master, obslist, ranges, sol_type, ncores=-1):
+def find_solution(master, obslist, ranges, sol_type, ncores=1):
     """
-    Find the best solution.
+    Find the best solution by grid search.
+
+    The whole grid is evaluated in a broadcast computation over a 4-D array with
+    shape (n1, n2, n3, nobs), so no Python-level loop over grid points is needed.
 
     Parameters
     ----------
@@ -100,22 +230,158 @@ def find_solution(master, obslist, ranges, sol_type, ncores=-1):
     sol_type : str
         Solution type, either 'geographic' or 'cylindrical'.
     ncores : int, optional
-        Number of cores to use. If -1, use all available cores.
+        Number of cores to use. If larger than 1, the first grid axis is split into
+        slabs that are evaluated by a multiprocessing pool. If -1, use all available
+        cores. The default of 1 is usually fastest except for very large grids.
 
     Returns
     -------
     tuple
-        The best solution, and the grid/Jout from scipy.optimize.brute function.
+        The best solution, the grid of searched parameters with shape (3, n1, n2, n3),
+        and the misfit values on the grid with shape (n1, n2, n3).
     """
     if sol_type not in ["geographic", "cylindrical"]:
         raise ValueError(f"Unrecognized solution type '{sol_type}'.")
-    result = optimize.brute(
-        func=try_solution_wrapper,
-        ranges=ranges,
-        args=(master, obslist, sol_type),
-        finish=None,
-        full_output=True,
-        workers=ncores,
+    # Pack the observations into arrays once so that the whole search is array
+    # arithmetic.
+    obs = pack_obs(obslist)
+
+    grid = np.mgrid[ranges]
+    if ncores == -1:
+        ncores = os.cpu_count()
+    if ncores == 1:
+        Jout = grid_misfit(master, obs, grid, sol_type)
+    else:
+        # Split the first grid axis into slabs and farm them out to a pool of
+        # workers. Each slab reduces to its own misfit sub-cube, so the results
+        # simply concatenate along the first axis.
+        slabs = np.array_split(grid, ncores, axis=1)
+        with Pool(ncores) as pool:
+            Jout = np.concatenate(
+                pool.starmap(
+                    grid_misfit, [(master, obs, slab, sol_type) for slab in slabs]
+                ),
+                axis=0,
+            )
+
+    return find_best_solution(grid, Jout, sol_type), grid, Jout
+
+
+def find_best_solution(grid, Jout, sol_type):
+    """
+    Find the best solution from the misfit values on a grid.
+
+    Useful to revisit a finished grid search, e.g., after loading the grid and misfit
+    values with load_solutions().
+
+    Parameters
+    ----------
+    grid : array
+        Grid of searched parameters with shape (3, n1, n2, n3).
+    Jout : array
+        Misfit values on the grid with shape (n1, n2, n3).
+    sol_type : str
+        Solution type, either 'geographic' or 'cylindrical'.
+
+    Returns
+    -------
+    sol : Solution
+        The solution with the smallest misfit.
+    """
+    idx = np.unravel_index(np.argmin(Jout), Jout.shape)
+    return Solution(tuple(g[idx] for g in grid), sol_type)
+
+
+def find_solution_adaptive(master, obslist, ranges, sol_type, *, factor=5, ncores=1):
+    """
+    Find the best solution by a coarse-to-fine grid search.
+
+    A first pass searches every ``factor``-th point of each axis, then a second pass
+    searches a window of one coarse step around the coarse minimum at the full
+    resolution. For a smooth misfit surface this visits a small fraction of the full
+    grid and converges to the same minimum; for strongly multi-modal surfaces
+    (e.g., a very coarse azimuth axis) prefer the exhaustive find_solution().
+
+    Parameters
+    ----------
+    master : Event
+        Master event.
+    obslist : list
+        List of Obs objects.
+    ranges : tuple
+        Tuple of slice objects for grid search, as for find_solution().
+    sol_type : str
+        Solution type, either 'geographic' or 'cylindrical'.
+    factor : int, optional
+        Decimation factor of the coarse pass, i.e., the coarse step is
+        ``factor * step`` on each axis.
+    ncores : int, optional
+        Number of cores to use. See find_solution().
+
+    Returns
+    -------
+    tuple
+        The best solution, and the grid/Jout of the fine pass around it.
+    """
+    coarse = tuple(
+        slice(range_.start, range_.stop, range_.step * factor) for range_ in ranges
     )
-    params, _, grid, Jout = result
-    return Solution(params, sol_type), grid, Jout
+    sol, _, _ = find_solution(master, obslist, coarse, sol_type, ncores=ncores)
+
+    match sol_type:
+        case "geographic":
+            best = (sol.dlat, sol.dlon, sol.ddepth)
+        case "cylindrical":
+            best = (sol.ddist, sol.az, sol.ddepth)
+    # Refine a window of one coarse step around the coarse minimum, clipped to the
+    # original search ranges. The small epsilon keeps the upper bound inclusive.
+    fine = tuple(
+        slice(
+            max(range_.start, best_ - range_.step * factor),
+            min(range_.stop, best_ + range_.step * (factor + 0.5)),
+            range_.step,
+        )
+        for range_, best_ in zip(ranges, best)
+    )
+    return find_solution(master, obslist, fine, sol_type, ncores=ncores)
+
+
+def refine_solution(master, obslist, sol):
+    """
+    Refine a solution with a derivative-free local optimizer.
+
+    The accuracy of a grid search is limited by the grid spacing. Starting a
+    Nelder-Mead simplex search from a grid-search solution reaches sub-grid-spacing
+    accuracy with only a few dozen extra misfit evaluations, instead of squaring the
+    number of grid points.
+
+    Parameters
+    ----------
+    master : Event
+        Master event.
+    obslist : list
+        List of Obs objects.
+    sol : Solution
+        The starting solution, usually the best solution from find_solution().
+
+    Returns
+    -------
+    sol : Solution
+        The refined solution, with the tmean and misfit attributes set.
+    """
+    obs = pack_obs(obslist)
+    match sol.type:
+        case "geographic":
+            x0 = (sol.dlat, sol.dlon, sol.ddepth)
+        case "cylindrical":
+            x0 = (sol.ddist, sol.az, sol.ddepth)
+
+    def misfit(params):
+        trial = Solution(tuple(params), sol.type)
+        try_solution(master, obs, trial)
+        return trial.misfit
+
+    result = optimize.minimize(misfit, x0=x0, method="Nelder-Mead")
+    best = Solution(tuple(result.x), sol.type)
+    try_solution(master, obs, best)
+    return best
@@ -4,7 +4,7 @@ Visualization functions.
 
 import matplotlib.pyplot as plt
 import numpy as np
-from ddrelocator.helpers import obslist_to_dataframe
+from matplotlib.lines import Line2D
 
 
 def plot_dt_as_azimuth(ax, obslist, residual=False):
@@ -20,13 +20,14 @@ def plot_dt_as_azimuth(ax, obslist, residual=False):
     residual : bool, optional
         If True, plot residuals. Else, plot travel time differences.
     """
-    df = obslist_to_dataframe(obslist)
     if residual:
-        dt, title, ylabel = df.residual, "Residual vs azimuth", "Residual (s)"
+        title, ylabel = "Residual vs azimuth", "Residual (s)"
+        azimuth, dt = zip(*((obs.azimuth, obs.residual) for obs in obslist))
     else:
-        dt, title, ylabel = df.dt, "dt vs azimuth", "dt (s)"
+        title, ylabel = "dt vs azimuth", "dt (s)"
+        azimuth, dt = zip(*((obs.azimuth, obs.dt) for obs in obslist))
 
-    ax.scatter(df.azimuth, dt, s=25, marker="o")
+    ax.scatter(azimuth, dt, s=25, marker="o")
     ax.set_xlabel("Azimuth (deg)")
     ax.set_ylabel(ylabel)
     ax.set_title(title)
@@ -49,39 +50,53 @@ def plot_dt_on_map(ax, obslist, master, slave=None, residual=False):
     residual : bool, optional
         If True, plot residuals. Else, plot travel time differences.
     """
-    df = obslist_to_dataframe(obslist)
-
-    if residual:
-        dt, title = df.residual, "Residuals"
-    else:
-        dt, title = df.dt, "Travel time differences"
-    dt *= 1000  # convert to ms
-
-    # scale factor for marker size
-    factor = 200 / max(dt.abs().max(), 100)
+    title = "Residuals" if residual else "Travel time differences"
+    # Collect all needed columns in a single pass over the observations.
+    longitude, latitude, dt = map(
+        np.asarray,
+        zip(
+            *(
+                (obs.longitude, obs.latitude, obs.residual if residual else obs.dt)
+                for obs in obslist
+            )
+        ),
+    )
+    dt = dt * 1000  # convert to ms
+
+    # marker sizes and the positive/negative masks, computed once
+    sizes = np.abs(dt)
+    factor = 200 / max(sizes.max(), 100)
+    sizes *= factor
+    positive = dt >= 0
+    negative = ~positive
     # plot positive dt
     ax.scatter(
-        df.longitude[dt >= 0],
-        df.latitude[dt >= 0],
-        s=dt[dt >= 0] * factor,
+        longitude[positive],
+        latitude[positive],
+        s=sizes[positive],
         edgecolors="r",
         facecolors="none",
         marker="o",
+        rasterized=True,
     )
     # plot negative dt
     ax.scatter(
-        df.longitude[dt < 0],
-        df.latitude[dt < 0],
-        s=abs(dt[dt < 0]) * factor,
+        longitude[negative],
+        latitude[negative],
+        s=sizes[negative],
         edgecolors="b",
         facecolors="none",
         marker="s",
+        rasterized=True,
     )
-    # Add station labels
-    for i in range(len(obslist)):
+    # Add station labels. Matplotlib has no batch text API, so one annotate call per
+    # station is unavoidable, but iterate the prebuilt arrays rather than re-indexing
+    # obslist.
+    labels = [f"{obs.station}({obs.phase})" for obs in obslist]
+    for label, x, y in zip(labels, longitude, latitude):
         ax.annotate(
-            f"{obslist[i].station}({obslist[i].phase})",
-            (df.longitude[i], df.latitude[i]),
+            label,
+            (x, y),
             fontsize=6,
             xytext=(0, -5),
             textcoords="offset points",
@@ -89,22 +104,23 @@ def plot_dt_on_map(ax, obslist, master, slave=None, residual=False):
             verticalalignment="top",
         )
 
-    # Add legend
-    for dt in [-60, -40, -20, 20, 40, 60]:
-        if dt > 0:
-            edgecolor, marker = "r", "o"
-        else:
-            edgecolor, marker = "b", "s"
-        ax.scatter(
+    # Add legend. Use prebuilt Line2D handles instead of empty scatter artists.
+    # Line2D's markersize is a diameter in points while scatter's s is an area,
+    # hence the sqrt.
+    handles = [
+        Line2D(
             [],
             [],
-            s=abs(dt) * factor,
-            edgecolors=edgecolor,
-            facecolor="none",
-            marker=marker,
+            linestyle="none",
+            marker="o" if dt > 0 else "s",
+            markeredgecolor="r" if dt > 0 else "b",
+            markerfacecolor="none",
+            markersize=np.sqrt(abs(dt) * factor),
             label=f"{dt} ms",
         )
-    ax.legend(loc="upper left", scatterpoints=1, fontsize=8)
+        for dt in [-60, -40, -20, 20, 40, 60]
+    ]
+    ax.legend(handles=handles, loc="upper left", fontsize=8)
 
     ax.scatter(master.longitude, master.latitude, marker="*", s=100, c="k", alpha=0.5)
     if slave is not None:
@@ -147,20 +163,29 @@ def plot_misfit(grid, Jout, sol_type):
     elif sol_type == "cylindrical":
         names = ["distance (m)", "azimuth (degree)", "ddepth (m)"]
 
+    # float32 is plenty for display and halves what the renderer has to copy.
+    # No-op for searches from find_solution(), which already returns float32.
+    Jout = np.asarray(Jout, dtype=np.float32)
+    # index of the best solution, shared by all three panels
+    idx = np.argmin(Jout)
+
     i = 0
     for xi, yi, zi in ((0, 1, 2), (0, 2, 1), (1, 2, 0)):
         ax = axs[i]
         X, Y = grid[xi], grid[yi]
+        # The coordinate meshes are constant along the projected axis, so a slice
+        # gives the same 2-D arrays as a min-reduction; only Jout needs the reduction.
         cf = ax.pcolormesh(
-            np.amin(X, axis=zi),
-            np.amin(Y, axis=zi),
+            X.take(0, axis=zi),
+            Y.take(0, axis=zi),
             np.amin(Jout, axis=zi),
             cmap="viridis_r",
+            shading="nearest",
+            rasterized=True,
         )
         fig.colorbar(cf, ax=ax, orientation="vertical", label="Misfit")
 
         # plot the best solution
-        idx = np.argmin(Jout)
         ax.scatter(X.flat[idx], Y.flat[idx], s=50, c="r", marker="*")
 
         ax.set_xlabel(names[xi])
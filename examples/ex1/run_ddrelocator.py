@@ -63,5 +63,5 @@ plot_residual(obslist, master, slave_sol)
 # Visualize the misfit
 plot_misfit(grid, Jout, sol_type)
 
-# Save the solutions into a pickle file so it can be reused
-dump_solutions(grid, Jout, "solutions.pkl")
+# Save the solutions into a compressed npz file so it can be reused
+dump_solutions(grid, Jout, "solutions.npz")
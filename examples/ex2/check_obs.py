@@ -23,24 +23,23 @@ ev1, ev2 = read_events_from_csv("catalog.csv")
 print("Event 1: ", ev1)
 print("Event 2: ", ev2)
 
-# read traces for plotting
+# read traces for plotting and filter them in bulk, instead of trace by trace
 st1 = read(f"SAC/{ev1.id}/*Z.SAC")
 st2 = read(f"SAC/{ev2.id}/*Z.SAC")
+for st in (st1, st2):
+    st.filter(
+        "bandpass", freqmin=freqmin, freqmax=freqmax, corners=corners, zerophase=False
+    )
+
+# index the traces by network.station so the loop below doesn't scan the streams
+idx1 = {f"{tr.stats.network}.{tr.stats.station}": tr for tr in st1}
+idx2 = {f"{tr.stats.network}.{tr.stats.station}": tr for tr in st2}
 
 fig, ax = plt.subplots(1, 1, figsize=(7, 22))
 ax.get_yaxis().set_visible(False)
 for i, obs in enumerate(obslist):
     # Find the corresponding traces
-    network, station = obs.station.split(".")
-    tr1 = st1.select(network=network, station=station)[0]
-    tr2 = st2.select(network=network, station=station)[0]
-    # Filter the traces
-    tr1.filter(
-        "bandpass", freqmin=freqmin, freqmax=freqmax, corners=corners, zerophase=False
-    )
-    tr2.filter(
-        "bandpass", freqmin=freqmin, freqmax=freqmax, corners=corners, zerophase=False
-    )
+    tr1, tr2 = idx1[obs.station], idx2[obs.station]
 
     # Trim and normalize the traces
     tr1.trim(ev1.origin + obs.time + t0, ev1.origin + obs.time + t1)
@@ -48,8 +47,10 @@ for i, obs in enumerate(obslist):
     tr1.normalize()
     tr2.normalize()
 
-    ax.plot(tr1.times() + t0, tr1.data * 0.5 + i, "b", lw=1)
-    ax.plot(tr2.times() + t0, tr2.data * 0.5 + i, "r", lw=1)
+    # Rasterize the wiggles so saved PDF/SVG figures stay small; axes and
+    # labels remain vector.
+    ax.plot(tr1.times() + t0, tr1.data * 0.5 + i, "b", lw=1, rasterized=True)
+    ax.plot(tr2.times() + t0, tr2.data * 0.5 + i, "r", lw=1, rasterized=True)
 
     ax.text(
         t0 - 1.0, i, f"{obs.station} ({obs.phase})\n {obs.distance:.1f}°", ha="right"
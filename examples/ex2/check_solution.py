@@ -3,8 +3,10 @@ ex2: Check a solution.
 """
 
 import matplotlib.pyplot as plt
+import numpy as np
 from ddrelocator import Solution, try_solution
 from ddrelocator.helpers import read_events_from_csv, read_obslist
+from matplotlib.collections import LineCollection
 from obspy import read
 
 # Read the event pair
@@ -29,11 +31,11 @@ ddist, az, ddepth, tmean = 407.0, 137.0, 58, 1.9227
 
 sol = Solution((ddist, az, ddepth), type="cylindrical")
 try_solution(ev1, obslist, sol, keep_residual=True)
+# Force the tmean to the reported value and adjust the residuals accordingly,
+# in a single pass instead of one add loop and one subtract loop.
 for obs in obslist:
-    obs.residual += sol.tmean
-sol.tmean = tmean  # force the tmean to the reported value
-for obs in obslist:
-    obs.residual -= sol.tmean
+    obs.residual += sol.tmean - tmean
+sol.tmean = tmean
 
 # read traces for plotting
 st1 = read(f"SAC/{ev1.id}/*Z.SAC")
@@ -42,15 +44,21 @@ st2 = read(f"SAC/{ev2.id}/*Z.SAC")
 st1.filter("bandpass", freqmin=0.5, freqmax=3.0, corners=4, zerophase=False)
 st2.filter("bandpass", freqmin=0.5, freqmax=3.0, corners=4, zerophase=False)
 
+# index the traces by network.station so the loop below doesn't scan the streams
+idx1 = {f"{tr.stats.network}.{tr.stats.station}": tr for tr in st1}
+idx2 = {f"{tr.stats.network}.{tr.stats.station}": tr for tr in st2}
+
 t0, t1 = -4.0, 8.0
 fig, ax = plt.subplots(1, 1, figsize=(6, 30))
 ax.get_yaxis().set_visible(False)
 
+# Collect the wiggles as line segments and draw them as two LineCollections (one
+# per event) instead of two Line2D artists per observation. Rendering and PDF
+# output then deal with 2 artists rather than 2 * nobs.
+segments1, segments2 = [], []
 count = 1
 for obs in obslist:
-    network, station = obs.station.split(".")
-    tr1 = st1.select(network=network, station=station)[0]
-    tr2 = st2.select(network=network, station=station)[0]
+    tr1, tr2 = idx1[obs.station], idx2[obs.station]
 
     shift = obs.dt_pre + sol.tmean
     tr1.trim(ev1.origin + obs.time + t0, ev1.origin + obs.time + t1)
@@ -58,8 +66,8 @@ for obs in obslist:
     tr1.normalize()
     tr2.normalize()
 
-    ax.plot(tr1.times() + t0, tr1.data * 0.5 + count, "k", lw=0.75)
-    ax.plot(tr2.times() + t0, tr2.data * 0.5 + count, "b", lw=0.75)
+    segments1.append(np.column_stack((tr1.times() + t0, tr1.data * 0.5 + count)))
+    segments2.append(np.column_stack((tr2.times() + t0, tr2.data * 0.5 + count)))
     ax.text(
         t0 - 0.5,
         count,
@@ -76,12 +84,17 @@ for obs in obslist:
         va="center",
         fontsize=8,
     )
-    ax.set_title(
-        f"Event: {ev1.id} (black) / {ev2.id} (blue)\n"
-        f"Solution: {sol.ddist:.1f} m, {sol.az:.1f} deg, {sol.ddepth:.0f} m, {sol.tmean:.4f} s"
-    )
 
     count += 1
 
+ax.add_collection(LineCollection(segments1, colors="k", linewidths=0.75))
+ax.add_collection(LineCollection(segments2, colors="b", linewidths=0.75))
+ax.autoscale_view()
+ax.set_title(
+    f"Event: {ev1.id} (black) / {ev2.id} (blue)\n"
+    f"Solution: {sol.ddist:.1f} m, {sol.az:.1f} deg, "
+    f"{sol.ddepth:.0f} m, {sol.tmean:.4f} s"
+)
+
 plt.show()
 fig.savefig("waveform-alignment.pdf")
@@ -25,23 +25,27 @@ model = TauPyModel(model="iasp91")
 tshift_max = 20.0  # Search in the limited time window around the predicted arrival time
 
 
-def search_phase_pairs(phase, twin, cc_min, filter_kwargs):
+def search_phase_pairs(st1, st2, phase, twin, cc_min):
     """
     Search for phase pairs by cross correlations.
+
+    The streams must already be filtered. They are not modified, so the same pair of
+    streams can be reused for several phase searches.
     """
     obslist = []  # list to store the observations
 
-    # Read and filter waveforms
-    st1 = read(f"SAC/{ev1.id}/*Z.SAC").filter(**filter_kwargs)
-    st2 = read(f"SAC/{ev2.id}/*Z.SAC").filter(**filter_kwargs)
+    # Index the slave traces by network/station/channel once, so the loop below
+    # doesn't scan the whole stream for every master trace.
+    # We can't use the SEED ID here because location code may change.
+    idx2 = {}
+    for tr in st2:
+        key = (tr.stats.network, tr.stats.station, tr.stats.channel)
+        idx2.setdefault(key, []).append(tr)
 
     for tr1 in st1:  # Loop over traces of the master event
         # Find the slave event trace with the same network/station/channel
-        # We can't use the SEED ID here because location code may change.
-        st_match = st2.select(
-            network=tr1.stats.network,
-            station=tr1.stats.station,
-            channel=tr1.stats.channel,
+        st_match = idx2.get(
+            (tr1.stats.network, tr1.stats.station, tr1.stats.channel), []
         )
         match len(st_match):
             case 0:  # no matched trace. skip.
@@ -69,26 +73,42 @@ def search_phase_pairs(phase, twin, cc_min, filter_kwargs):
         print(tr1.id)
         # Change the reference time from phase arrival time to event origin time
         t0, t1 = ttime + twin[0], ttime + twin[1]
-        # Cut the trace of the master event around the predicted phase time.
-        tr1.trim(ev1.origin + t0, ev1.origin + t1)
+        # Cut the trace of the master event around the predicted phase time. Use
+        # slice() rather than trim() so the traces in the input streams stay intact.
+        win1 = tr1.slice(ev1.origin + t0, ev1.origin + t1)
         # Cut the trace of the slave event around the predicted phase time plus the
         # maximum time shift, because we know the time differences won't be too large.
         # This step is important to reduce the computation time.
-        tr2.trim(ev2.origin + t0 - tshift_max, ev2.origin + t1 + tshift_max)
-        if len(tr1) == 0 or len(tr2) == 0:
-            print(f"{tr1.id}: skipped due to zero-length {len(tr1)} {len(tr2)}.")
+        win2 = tr2.slice(ev2.origin + t0 - tshift_max, ev2.origin + t1 + tshift_max)
+        if len(win1) == 0 or len(win2) == 0:
+            print(f"{tr1.id}: skipped due to zero-length {len(win1)} {len(win2)}.")
             continue
 
-        # resample to 1000 Hz to have superhigh resolution in CC
-        tr1.resample(sampling_rate=1000)
-        tr2.resample(sampling_rate=1000)
+        # Single precision is plenty for a normalized CC and halves the bytes the
+        # correlation streams through. The slices own their .data binding, so this
+        # doesn't touch the input streams.
+        win1.data = np.require(win1.data, dtype=np.float32)
+        win2.data = np.require(win2.data, dtype=np.float32)
 
-        # Do CC between tr1 and tr2.
-        cc = correlate_template(tr2, tr1, mode="valid", normalize="full")
-        idx = np.argmax(np.abs(cc))  # index of the max CC value
+        # Do CC between the two windows at the native sampling rate.
+        cc = correlate_template(win2, win1, mode="valid", normalize="full")
+        abscc = np.abs(cc)
+        idx = np.argmax(abscc)  # index of the max CC value
         value = cc[idx]  # max CC value. Maybe negative
+        # Refine the peak to sub-sample precision by fitting a parabola through the
+        # three |CC| samples around the maximum. This gives the same sub-sample
+        # resolution that resampling to 1000 Hz used to provide, at a tiny fraction
+        # of the cost.
+        delta = 0.0
+        if 0 < idx < len(cc) - 1:
+            y0, y1, y2 = abscc[idx - 1], abscc[idx], abscc[idx + 1]
+            denom = y0 - 2.0 * y1 + y2
+            if denom != 0.0:
+                delta = 0.5 * (y0 - y2) / denom
         # time shift of tr2 to match tr1
-        shift = tr2.stats.starttime - (ev2.origin + t0) + idx * tr2.stats.delta
+        shift = (
+            win2.stats.starttime - (ev2.origin + t0) + (idx + delta) * win2.stats.delta
+        )
 
         # Skip if CC value is too small
         if value < cc_min:
@@ -116,10 +136,14 @@ def search_phase_pairs(phase, twin, cc_min, filter_kwargs):
 filter_kwargs = dict(
     type="bandpass", freqmin=0.5, freqmax=3.0, corners=4, zerophase=False
 )
-obslist = search_phase_pairs("P", (0.0, 5.0), 0.9, filter_kwargs)
-# obslist = search_phase_pairs("pP", (0, 5.0), 0.9, filter_kwargs)
-# obslist = search_phase_pairs("sP", (0, 5.0), 0.9, filter_kwargs)
-# obslist = search_phase_pairs("PcP", (0, 5.0), 0.9, filter_kwargs)
+# Read and filter the waveforms once; all phase searches reuse the same streams.
+st1 = read(f"SAC/{ev1.id}/*Z.SAC").filter(**filter_kwargs)
+st2 = read(f"SAC/{ev2.id}/*Z.SAC").filter(**filter_kwargs)
+
+obslist = search_phase_pairs(st1, st2, "P", (0.0, 5.0), 0.9)
+# obslist = search_phase_pairs(st1, st2, "pP", (0, 5.0), 0.9)
+# obslist = search_phase_pairs(st1, st2, "sP", (0, 5.0), 0.9)
+# obslist = search_phase_pairs(st1, st2, "PcP", (0, 5.0), 0.9)
 
 # dump the observations to a file
 dump_obslist(obslist, "obs-2003-1995.dat")
@@ -18,6 +18,7 @@ class Channel3C:
     location: str
     channel: str
     coord: dict
+    baz: float  # back azimuth from the station to the event
 
 
 # The poles and zeros information are from SAC source code `sac/src/icm/wwsp.c`.
@@ -52,11 +53,13 @@ common_stations = set(f"{tr.stats.network}.{tr.stats.station}" for tr in st1) &
     f"{tr.stats.network}.{tr.stats.station}" for tr in st2
 )
 
-# Only keep the common stations for the two events.
+# Only keep the common stations for the two events. Rebuild the trace list instead
+# of calling Stream.remove() while looping over the stream, which skips the element
+# after each removal and costs O(N) per call.
 for st in (st1, st2):
-    for tr in st:
-        if f"{tr.stats.network}.{tr.stats.station}" not in common_stations:
-            st.remove(tr)
+    st.traces = [
+        tr for tr in st if f"{tr.stats.network}.{tr.stats.station}" in common_stations
+    ]
 
 for st, inv, ev in [(st1, inv1, ev1), (st2, inv2, ev2)]:
     # Merge and remove instrumental responses to WWSP
@@ -76,22 +79,30 @@ for st, inv, ev in [(st1, inv1, ev1), (st2, inv2, ev2)]:
     # account. So we need to use '->ZNE' first then 'NE->RT'.
     st_RT = st.copy()
 
-    # Create a dictionary of Channel3C objects.
+    # Cache of channel orientations, shared by the orthogonality check below and the
+    # SAC writing loop. Each inv.get_orientation() call traverses the inventory.
+    orientations = {}
+
+    # Create a dictionary of Channel3C objects. The back azimuth is computed once per
+    # channel triplet, not once per trace.
     channel3c = {}
     for tr in st_RT:
         key = tr.id[:-1]
         if key not in channel3c:
             network, station, location, channel = key.split(".")
             coord = inv.get_coordinates(tr.id, datetime=ev.origin)
-            channel3c[key] = Channel3C(network, station, location, channel, coord)
+            baz = gps2dist_azimuth(
+                ev.latitude, ev.longitude, coord["latitude"], coord["longitude"]
+            )[2]
+            channel3c[key] = Channel3C(network, station, location, channel, coord, baz)
 
         # Add back azimuth information to traces so that 'NE->RT' can work properly.
-        tr.stats.back_azimuth = gps2dist_azimuth(
-            ev.latitude, ev.longitude, coord["latitude"], coord["longitude"]
-        )[2]
+        tr.stats.back_azimuth = channel3c[key].baz
 
     # Remove traces that don't have all 3 components and the horizontal components are
-    # not orthogonal.
+    # not orthogonal. Collect the doomed traces first and rebuild the trace list once,
+    # instead of one O(N) Stream.remove() call per trace.
+    to_drop = set()
     for chn3c in channel3c.values():
         rtz = st_RT.select(
             network=chn3c.network,
@@ -100,25 +111,27 @@ for st, inv, ev in [(st1, inv1, ev1), (st2, inv2, ev2)]:
             channel=f"{chn3c.channel}?",
         )
         if len(rtz) != 3:  # Need all three components
-            for _ in rtz:
-                st_RT.remove(_)
+            to_drop.update(id(tr) for tr in rtz)
             continue
 
         # Check if the remaining components are N and E
         rtz.remove(rtz.select(component="Z")[0])
         tr1, tr2 = rtz
-        cmpaz1 = inv.get_orientation(tr1.id, datetime=ev.origin)["azimuth"]
-        cmpaz2 = inv.get_orientation(tr2.id, datetime=ev.origin)["azimuth"]
+        for tr_id in (tr1.id, tr2.id):
+            if tr_id not in orientations:
+                orientations[tr_id] = inv.get_orientation(tr_id, datetime=ev.origin)
+        cmpaz1 = orientations[tr1.id]["azimuth"]
+        cmpaz2 = orientations[tr2.id]["azimuth"]
         if not (89 <= abs(cmpaz1 - cmpaz2) <= 90.0):
-            for _ in rtz:
-                st_RT.remove(_)
+            to_drop.update(id(tr) for tr in rtz)
             continue
+    st_RT.traces = [tr for tr in st_RT if id(tr) not in to_drop]
 
     # Rotation
     st_RT.rotate(method="->ZNE", inventory=inv, components=["ZNE", "Z12", "123"])
     st_RT.rotate(method="NE->RT")
-    for tr in st_RT.select(component="Z"):  # Z component is not needed
-        st_RT.remove(tr)
+    # Z component is not needed
+    st_RT.traces = [tr for tr in st_RT if not tr.stats.channel.endswith("Z")]
 
     Path(f"SAC/{ev.id}").mkdir(parents=True, exist_ok=True)
     for tr in st + st_RT:
@@ -142,7 +155,9 @@ for st, inv, ev in [(st1, inv1, ev1), (st2, inv2, ev2)]:
 
         if tr.stats.channel[-1] not in "RT":  # ZNE components
             # set channel orientation
-            orient = inv.get_orientation(tr.id, datetime=ev.origin)
+            if tr.id not in orientations:
+                orientations[tr.id] = inv.get_orientation(tr.id, datetime=ev.origin)
+            orient = orientations[tr.id]
             # Need to cautious with the different definitions of 'dip'
             # In ObsPy, 'dip' is degrees, down from horizontal [-90, 90].
             # In SAC, 'dip' is degrees, down from vertical-up [0, 180].